@@ -1,12 +1,26 @@
 """
 Flask API for Phone Recommendation Engine
 Endpoint: http://localhost:5001/api/recommend
+
+Production (settings in gunicorn.conf.py):
+    gunicorn app:app
 """
 
+if __name__ == "__main__":
+    # Dev runs: patch the stdlib before anything else imports it
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        pass
+
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+import orjson
 from pathlib import Path
 import sys
+import threading
 
 # Add project to path
 BASE_DIR = Path(__file__).parent
@@ -14,7 +28,22 @@ sys.path.insert(0, str(BASE_DIR))
 
 from recommender import PhoneRecommender, train_model
 
+try:
+    from gevent import monkey
+    from batcher import QueryBatcher
+except ImportError:
+    monkey = None
+
+class OrjsonProvider(JSONProvider):
+    """Serialize responses with orjson (handles NumPy scalars directly)"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Enable CORS with proper configuration
 CORS(app, resources={
@@ -35,62 +64,85 @@ MODEL_PATH = BASE_DIR / "models" / "phone_recommender.pkl"
 DATA_PATH = BASE_DIR / "data" / "phones_data.csv"
 
 recommender = None
+_recommender_lock = threading.Lock()
 
-def initialize_model():
+def initialize_model(setup_process=True):
     """Load or train the model"""
-    global recommender
-    
+    # Build into a local so other requests never see a half-prepared model
+    model = None
     if MODEL_PATH.exists():
         print("📦 Loading existing model...")
-        recommender = PhoneRecommender()
         try:
-            recommender = recommender.load_model(MODEL_PATH)
+            model = PhoneRecommender().load_model(MODEL_PATH)
         except Exception as exc:
             print(f"⚠️  Model load failed, rebuilding: {exc}")
-            recommender = PhoneRecommender()
+            model = None
     
-    if recommender is None or getattr(recommender, "df", None) is None:
+    if model is None or getattr(model, "df", None) is None:
         print("🤖 Training new model...")
+        model = PhoneRecommender()
         # First prepare data if needed
         if not DATA_PATH.exists():
             print("📊 Preparing data...")
             from prepare_data import save_data_csv
             save_data_csv()
         
-        recommender.load_data(DATA_PATH)
-        recommender.prepare_features()
-        recommender.save_model(MODEL_PATH)
-
-    if recommender is None:
-        return None
+        model.load_data(DATA_PATH)
+        model.prepare_features()
+        model.save_model(MODEL_PATH)
 
-    if getattr(recommender, "df", None) is None:
-        if not DATA_PATH.exists():
-            print("📊 Preparing data...")
-            from prepare_data import save_data_csv
-            save_data_csv()
-        recommender.load_data(DATA_PATH)
-
-    if getattr(recommender, "tfidf_matrix", None) is None:
+    if getattr(model, "tfidf_dense", None) is None:
         print("🔧 Preparing missing features...")
-        recommender.prepare_features()
-        recommender.save_model(MODEL_PATH)
+        model.prepare_features()
+        model.save_model(MODEL_PATH)
     
-    return recommender
+    if setup_process:
+        setup_model_process(model)
+    return model
+
+def setup_model_process(model):
+    """Per-process setup: JIT threads and the gevent batcher must not cross a fork"""
+    model.warm_up()
+    attach_batcher(model)
+
+def attach_batcher(model):
+    """Batch concurrent text queries when running on gevent"""
+    if monkey is not None and monkey.is_module_patched("threading"):
+        model.query_batcher = QueryBatcher(model)
+    return model
 
 def get_recommender():
-    """Ensure the recommender is loaded before handling requests."""
+    """Lazily load the recommender on first use, once per worker."""
     global recommender
     if recommender is None:
-        recommender = initialize_model()
-    elif getattr(recommender, "tfidf_matrix", None) is None:
-        recommender = initialize_model()
+        with _recommender_lock:
+            # Another thread/greenlet may have finished while we waited
+            if recommender is None:
+                recommender = initialize_model()
     return recommender
 
-try:
-    initialize_model()
-except Exception as exc:
-    print(f"⚠️  Model initialization failed: {exc}")
+def preload_model():
+    """Load the model in the gunicorn master so forked workers share its pages"""
+    global recommender
+    try:
+        with _recommender_lock:
+            if recommender is None:
+                recommender = initialize_model(setup_process=False)
+    except Exception as exc:
+        print(f"⚠️  Model preload failed, workers will load lazily: {exc}")
+    return recommender
+
+def init_worker():
+    """Finish setting up the inherited (or freshly loaded) model in a worker"""
+    global recommender
+    try:
+        with _recommender_lock:
+            if recommender is None:
+                recommender = initialize_model(setup_process=False)
+            setup_model_process(recommender)
+    except Exception as exc:
+        print(f"⚠️  Model initialization failed: {exc}")
+    return recommender
 
 # ===========================
 # ROOT PAGE
@@ -148,7 +200,11 @@ def recommend():
                 budget = int(budget)
             except (TypeError, ValueError):
                 budget = None
-        top_k = data.get("top_k", 5)
+        top_k = data.get("top_k")
+        try:
+            top_k = max(int(top_k), 0)
+        except (TypeError, ValueError):
+            top_k = 5
 
         model = get_recommender()
         if model is None:
@@ -269,20 +325,9 @@ def stats():
         if model is None:
             return jsonify({"error": "Model not available"}), 503
 
-        stats_data = {
-            "total_phones": len(model.df),
-            "brands": model.df['brand'].unique().tolist(),
-            "price_range": {
-                "min": int(model.df['price'].min()),
-                "max": int(model.df['price'].max()),
-                "avg": int(model.df['price'].mean())
-            },
-            "use_cases": model.df['best_for'].unique().tolist()[:10]
-        }
-        
         return jsonify({
             "success": True,
-            "stats": stats_data
+            "stats": model.stats
         }), 200
     
     except Exception as e:
@@ -302,7 +347,7 @@ def server_error(e):
 
 if __name__ == "__main__":
     print("🚀 Initializing Phone Recommender API...\n")
-    initialize_model()
+    get_recommender()
     print("\n✅ API Ready!")
     print("📍 Running on http://localhost:5001")
     print("\nAvailable endpoints:")
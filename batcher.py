@@ -0,0 +1,62 @@
+"""
+Query Batcher
+Groups text queries that queue up while a batch is being scored into one pass
+"""
+
+import gevent
+from gevent.event import AsyncResult
+from gevent.queue import Queue, Empty
+
+MAX_BATCH_SIZE = 32
+
+class QueryBatcher:
+    def __init__(self, recommender, max_batch_size=MAX_BATCH_SIZE):
+        self.recommender = recommender
+        self.max_batch_size = max_batch_size
+        self.queue = Queue()
+        self._dispatcher = None
+
+    def submit(self, query, top_k):
+        """Queue a query and block this greenlet until its batch is scored"""
+        # Start lazily so the dispatcher lives in the worker that serves requests
+        if self._dispatcher is None or self._dispatcher.dead:
+            self._dispatcher = gevent.spawn(self._run)
+
+        result = AsyncResult()
+        self.queue.put((query, top_k, result))
+        return result.get()
+
+    def _collect_batch(self):
+        """Wait for one query, then take whatever else is already queued (no extra wait)"""
+        batch = [self.queue.get()]
+        # A lone request dispatches immediately; batches only form under load
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Dispatcher loop: score each batch and resolve its pending results"""
+        while True:
+            batch = self._collect_batch()
+            queries = [query for query, _, _ in batch]
+            top_ks = [top_k for _, top_k, _ in batch]
+            try:
+                results = self.recommender.recommend_by_text_batch(queries, top_ks)
+            except Exception:
+                # Retry one by one so a bad query fails alone, not its whole batch
+                self._run_individually(batch)
+                continue
+
+            for (_, _, result), recommendations in zip(batch, results):
+                result.set(recommendations)
+
+    def _run_individually(self, batch):
+        """Score each query of a failed batch on its own"""
+        for query, top_k, result in batch:
+            try:
+                result.set(self.recommender.recommend_by_text_batch([query], [top_k])[0])
+            except Exception as exc:
+                result.set_exception(exc)
@@ -0,0 +1,26 @@
+"""
+Gunicorn Configuration for Phone Recommendation API
+Usage: gunicorn app:app
+"""
+
+import gc
+
+bind = "0.0.0.0:5001"
+worker_class = "gevent"
+workers = 2
+worker_connections = 1000
+
+# Load the model once in the master; workers inherit it copy-on-write
+preload_app = True
+
+def when_ready(server):
+    """Load the model before forking workers"""
+    import app
+    app.preload_model()
+    # Keep the GC from touching (and so copying) the inherited objects' pages
+    gc.freeze()
+
+def post_worker_init(worker):
+    """Per-worker setup once gevent has patched the worker process"""
+    import app
+    app.init_worker()
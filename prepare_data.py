@@ -3,8 +3,8 @@ Data Preparation Script
 Extract phone data from JSON files and prepare for AI model
 """
 
-import json
 import os
+import orjson
 import pandas as pd
 from pathlib import Path
 
@@ -13,54 +13,63 @@ BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 TOP3_DATA_DIR = Path(r"c:\Users\Shubham\Desktop\top3-mobile\data")
 
+FIELDS = [
+    "id", "model", "brand", "price", "launch_year", "processor", "ram", "storage",
+    "display", "battery", "best_for", "gaming", "camera", "battery_score",
+    "performance", "display_score", "reason", "rating",
+]
+
 def extract_phone_data():
-    """Extract all phone data from JSON files"""
+    """Extract all phone data from JSON files as a dict of columns"""
     brands = ["samsung", "realme", "redmi", "poco", "apple", "vivo", "oppo", "motorola"]
-    all_phones = []
+    cols = {name: [] for name in FIELDS}
     
     for brand in brands:
         brand_file = TOP3_DATA_DIR / f"{brand}.json"
         try:
-            with open(brand_file, "r", encoding="utf-8") as f:
-                brand_data = json.load(f)
-                
-            if isinstance(brand_data, dict) and "phones" in brand_data:
-                phones = brand_data.get("phones", [])
-                
-                for phone in phones:
-                    # Extract key features
-                    phone_record = {
-                        "id": phone.get("id", ""),
-                        "model": phone.get("model", ""),
-                        "brand": brand_data.get("brand", brand.capitalize()),
-                        "price": phone.get("price", 0),
-                        "launch_year": phone.get("launch_year", 0),
-                        "processor": phone.get("processor", ""),
-                        "ram": phone.get("ram", [""])[0] if isinstance(phone.get("ram"), list) else phone.get("ram", ""),
-                        "storage": phone.get("storage", [""])[0] if isinstance(phone.get("storage"), list) else phone.get("storage", ""),
-                        "display": str(phone.get("display", {}).get("size", "")) if isinstance(phone.get("display"), dict) else "",
-                        "battery": str(phone.get("battery", {}).get("capacity", "")) if isinstance(phone.get("battery"), dict) else "",
-                        "best_for": ", ".join(phone.get("best_for", [])) if isinstance(phone.get("best_for"), list) else "",
-                        "gaming": phone.get("gaming", 4.0),
-                        "camera": phone.get("camera", 4.0),
-                        "battery_score": phone.get("battery_score", 4.0) if "battery_score" in phone else 4.0,
-                        "performance": phone.get("performance", 4.0),
-                        "display_score": phone.get("display", 4.0) if isinstance(phone.get("display"), (int, float)) else 4.0,
-                        "reason": phone.get("reason", ""),
-                        "rating": phone.get("rating", 4.0),
-                    }
-                    all_phones.append(phone_record)
-                    
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+            brand_data = orjson.loads(brand_file.read_bytes())
+        except (FileNotFoundError, orjson.JSONDecodeError) as e:
             print(f"Error loading {brand}.json: {e}")
+            continue
+        
+        if not (isinstance(brand_data, dict) and "phones" in brand_data):
+            continue
+        
+        brand_name = brand_data.get("brand", brand.capitalize())
+        for phone in brand_data.get("phones", []):
+            ram = phone.get("ram", "")
+            storage = phone.get("storage", "")
+            display = phone.get("display", {})
+            battery = phone.get("battery", {})
+            best_for = phone.get("best_for", [])
+            
+            # Extract key features, one column at a time
+            cols["id"].append(phone.get("id", ""))
+            cols["model"].append(phone.get("model", ""))
+            cols["brand"].append(brand_name)
+            cols["price"].append(phone.get("price", 0))
+            cols["launch_year"].append(phone.get("launch_year", 0))
+            cols["processor"].append(phone.get("processor", ""))
+            cols["ram"].append((ram or [""])[0] if isinstance(ram, list) else ram)
+            cols["storage"].append((storage or [""])[0] if isinstance(storage, list) else storage)
+            cols["display"].append(str(display.get("size", "")) if isinstance(display, dict) else "")
+            cols["battery"].append(str(battery.get("capacity", "")) if isinstance(battery, dict) else "")
+            cols["best_for"].append(", ".join(best_for) if isinstance(best_for, list) else "")
+            cols["gaming"].append(phone.get("gaming", 4.0))
+            cols["camera"].append(phone.get("camera", 4.0))
+            cols["battery_score"].append(phone.get("battery_score", 4.0))
+            cols["performance"].append(phone.get("performance", 4.0))
+            cols["display_score"].append(display if isinstance(display, (int, float)) else 4.0)
+            cols["reason"].append(phone.get("reason", ""))
+            cols["rating"].append(phone.get("rating", 4.0))
     
-    return all_phones
+    return cols
 
 def save_data_csv():
     """Save extracted data as CSV"""
     phones = extract_phone_data()
     
-    if not phones:
+    if not phones["id"]:
         print("❌ No phone data extracted!")
         return False
     
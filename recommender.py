@@ -4,27 +4,135 @@ Uses TF-IDF + Cosine Similarity for intelligent recommendations
 """
 
 import json
+import os
+import re
+import tempfile
+from collections import defaultdict
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.preprocessing import normalize
 import joblib
 
+import recommender_kernels
+
+try:
+    import pyarrow
+except ImportError:  # optional fast CSV/Parquet I/O; fall back to the C parser
+    pyarrow = None
+
+try:
+    import simsimd
+except ImportError:  # optional SIMD kernels; fall back to NumPy dot products
+    simsimd = None
+
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 MODELS_DIR = BASE_DIR / "models"
+TEXT_CACHE_SIZE = 1024
+
+# Stateless term hashing: no vocabulary to fit, store or look up
+HASH_FEATURES = 1024
+HASHER = HashingVectorizer(n_features=HASH_FEATURES, alternate_sign=False, norm=None, lowercase=True)
+
+# "under 20000", "below 20,000", "under 1.5 lakh", "<= 15000", "20k"
+# Thousands separators in Western (1,200,000) or Indian (12,00,000) grouping, or decimals
+_AMOUNT = r'(\d{1,3}(?:,\d{3})+|\d{1,2}(?:,\d{2})+,\d{3}|\d+(?:\.\d+)?)(?![.,]?\d)'
+_UNIT = r'(k|lakhs?)'
+BUDGET_RE = re.compile(
+    rf'(?:\b(?:under|below)|<=?)\s*{_AMOUNT}\s*{_UNIT}?\b|\b{_AMOUNT}\s*{_UNIT}\b',
+    re.IGNORECASE,
+)
+UNIT_MULTIPLIERS = {'k': 1000, 'lakh': 100000, 'lakhs': 100000}
+# A bare "Nk" is only a price from here up, so "4k video" / "8k video" stay text
+MIN_BARE_K_BUDGET = 10000
+
+# Plain arrays saved as .npy next to the model so workers can mmap them
+ARRAY_ATTRS = ['idf', 'tfidf_dense', 'feature_matrix', 'price_np', 'rating_np', 'best_for_lower']
+CSR_PARTS = ['data', 'indices', 'indptr']
+# DataFrame columns returned in results, cached as NumPy arrays
+RESULT_COLUMNS = ['model', 'brand', 'price', 'rating', 'processor', 'best_for', 'reason']
+
+def _default_file_mode():
+    """Mode open() would give a new file under the current umask"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def _write_atomically(path, write):
+    """Write a file via a temp file in the same directory, then rename it into place"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600; match what a plain open() would have produced
+        os.chmod(tmp_path, _default_file_mode())
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def _arrays_dir(model_path):
+    """Directory holding the mmap-able arrays for a model file"""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + "_arrays")
+
+def parse_budget(query):
+    """Split a text query into (residual text, budget or None)"""
+    for match in BUDGET_RE.finditer(query):
+        bare = match.group(1) is None
+        amount, unit = match.group(3, 4) if bare else match.group(1, 2)
+        amount = float(amount.replace(',', ''))
+        if unit is None and not amount.is_integer():
+            continue  # "under 1.5" is not a price
+        budget = int(round(amount * UNIT_MULTIPLIERS.get((unit or '').lower(), 1)))
+        if bare and budget < MIN_BARE_K_BUDGET:
+            continue
+        residual = (query[:match.start()] + ' ' + query[match.end():]).strip()
+        return residual, budget
+    return query, None
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def _cached_text(recommender, query, top_k):
+    """Memoize text recommendations per (model, normalized query, top_k)"""
+    return tuple(recommender._recommend_by_text_uncached(query, top_k))
 
 class PhoneRecommender:
     def __init__(self):
         self.df = None
-        self.tfidf_vectorizer = None
+        self.idf = None
         self.tfidf_matrix = None
+        self.tfidf_dense = None
         self.feature_matrix = None
+        self.price_np = None
+        self.rating_np = None
+        self.best_for_lower = None
+        self.use_case_index = None
+        self.query_batcher = None
+        self.stats = None
+        self.result_columns = None
         
     def load_data(self, csv_path):
-        """Load phone data from CSV"""
-        self.df = pd.read_csv(csv_path)
+        """Load phone data from CSV, via a Parquet snapshot when it is fresh"""
+        csv_path = Path(csv_path)
+        if pyarrow is None:
+            self.df = pd.read_csv(csv_path)
+        else:
+            parquet_path = csv_path.with_suffix('.parquet')
+            if parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+                self.df = pd.read_parquet(parquet_path)
+            else:
+                self.df = pd.read_csv(csv_path, engine='pyarrow')
+                # Best-effort cache: renamed into place so concurrent readers never
+                # see a partial file, and skipped if the data directory is read-only
+                try:
+                    _write_atomically(parquet_path, lambda f: self.df.to_parquet(f, index=False))
+                except OSError as exc:
+                    print(f"⚠️  Parquet cache not written: {exc}")
         print(f"✅ Loaded {len(self.df)} phones")
         return self.df
     
@@ -38,9 +146,17 @@ class PhoneRecommender:
             self.df['reason'].fillna('')
         )
         
-        # TF-IDF Vectorization
-        self.tfidf_vectorizer = TfidfVectorizer(max_features=100, lowercase=True)
-        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(self.df['combo_features'])
+        # TF-IDF Vectorization over hashed term counts
+        term_counts = HASHER.transform(self.df['combo_features'])
+        self.idf = TfidfTransformer().fit(term_counts).idf_
+        self.tfidf_matrix = self._vectorize(self.df['combo_features'])
+        # Unit-length rows so cosine similarity is a plain dot product at query time
+        self.tfidf_matrix = normalize(self.tfidf_matrix, norm='l2', copy=False)
+        # Scoring copy for when Numba is missing (the kernel reads the CSR matrix).
+        # Small vocabulary, so a dense copy is tiny and SIMD-friendly. Unit-length
+        # rows have a narrow range, so float16 keeps the top-k ordering intact.
+        # Always built: app.initialize_model also uses it as the readiness check
+        self.tfidf_dense = np.ascontiguousarray(self.tfidf_matrix.toarray(), dtype=np.float16)
         
         # Normalize numeric features
         numeric_features = ['price', 'gaming', 'camera', 'battery_score', 'performance', 'rating']
@@ -59,65 +175,220 @@ class PhoneRecommender:
         
         self.feature_matrix = feature_df.values
         
+        self.build_result_columns()
+        
+        # Plain arrays for mask-based spec filtering
+        self.price_np = self.df['price'].to_numpy()
+        self.rating_np = self.df['rating'].to_numpy()
+        
+        # Lowercased use cases plus a token -> row positions index for spec filtering
+        self.best_for_lower = self.df['best_for'].fillna('').str.lower().to_numpy(dtype=str)
+        use_case_index = defaultdict(list)
+        tokens = {token.strip() for best_for in self.best_for_lower for token in best_for.split(',')}
+        for token in filter(None, tokens):
+            # Substring match so "compact" still finds "compact flagship"
+            for row_idx, best_for in enumerate(self.best_for_lower):
+                if token in best_for:
+                    use_case_index[token].append(row_idx)
+        self.use_case_index = {token: np.array(rows) for token, rows in use_case_index.items()}
+        
+        # Dataset stats never change for a trained model, so build them once
+        self.stats = {
+            "total_phones": len(self.df),
+            "brands": self.df['brand'].unique().tolist(),
+            "price_range": {
+                "min": int(self.df['price'].min()),
+                "max": int(self.df['price'].max()),
+                "avg": int(self.df['price'].mean())
+            },
+            "use_cases": self.df['best_for'].unique().tolist()[:10]
+        }
+        
+        # Features changed, cached text results are stale
+        _cached_text.cache_clear()
+        
         print("✅ Features prepared")
+    def build_result_columns(self):
+        """Cache result columns as arrays so row lookups skip pandas indexing"""
+        self.result_columns = {col: self.df[col].to_numpy() for col in RESULT_COLUMNS}
+    
     def recommend_by_text(self, query, top_k=5):
         """Recommend phones based on text query"""
-        if self.tfidf_matrix is None:
+        if self.tfidf_dense is None:
             raise ValueError("Model not trained! Call prepare_features() first")
         
-        # Vectorize query
-        query_vector = self.tfidf_vectorizer.transform([query])
+        # Reject bad input here so it never reaches a shared batch
+        try:
+            top_k = max(int(top_k), 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"top_k must be an integer, got {top_k!r}") from None
         
-        # Calculate similarity
-        similarities = cosine_similarity(query_vector, self.tfidf_matrix)[0]
+        # Vectorizer lowercases anyway, so normalize the key for better cache hits
+        results = _cached_text(self, query.lower().strip(), top_k)
+        return [dict(result) for result in results]
+    
+    def recommend_by_text_batch(self, queries, top_ks):
+        """Recommend phones for several text queries, vectorized in one pass"""
+        if self.tfidf_dense is None:
+            raise ValueError("Model not trained! Call prepare_features() first")
+        
+        # Budget phrases become a price filter; only the rest is matched as text
+        parsed = [parse_budget(query) for query in queries]
+        budget_rows = [self._budget_rows(budget) for _, budget in parsed]
+        query_vectors = self._query_vectors([residual for residual, _ in parsed])
+        
+        if recommender_kernels.topk_cosine is not None and len(queries) == 1:
+            results = [self._top_text_results_compiled(query_vectors[0], top_ks[0], budget_rows[0])]
+        else:
+            if recommender_kernels.topk_cosine is not None:
+                # Whole batch in one sparse (N x V) @ (V x B) product at full precision
+                similarities = (self.tfidf_matrix @ query_vectors.T).T
+            else:
+                similarities = self._text_similarities(query_vectors)
+            results = []
+            for row, rows, top_k in zip(similarities, budget_rows, top_ks):
+                if rows is not None:
+                    row = row[rows]
+                results.append(self._top_text_results(row, top_k, rows))
         
-        # Get top K indices
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        # Mostly-budget queries ("phone under 15000") match no text:
+        # fall back to the best-rated phones within budget
+        for i, (rows, top_k) in enumerate(zip(budget_rows, top_ks)):
+            if rows is not None and not results[i]:
+                top_indices = self._top_rated(rows, top_k)
+                results[i] = self._text_results(top_indices, np.zeros(top_indices.size), require_match=False)
+        return results
+    
+    def _recommend_by_text_uncached(self, query, top_k):
+        """Score a text query against every phone"""
+        # Let concurrent requests share one vectorization pass when batching is enabled
+        if self.query_batcher is not None:
+            return self.query_batcher.submit(query, top_k)
+        return self.recommend_by_text_batch([query], [top_k])[0]
+    
+    def _budget_rows(self, budget):
+        """Row positions of phones within budget, or None for no limit"""
+        if budget is None:
+            return None
+        return np.flatnonzero(self.price_np <= budget)
+    
+    def _top_text_results_compiled(self, query_vector, top_k, rows=None):
+        """Score and select the top K in one compiled pass over the CSR matrix"""
+        if rows is None:
+            rows = np.arange(self.tfidf_matrix.shape[0])
+        k = min(top_k, rows.size)
+        if k <= 0:
+            return []
+        top_indices, scores = recommender_kernels.topk_cosine(
+            self.tfidf_matrix.data, self.tfidf_matrix.indices, self.tfidf_matrix.indptr,
+            query_vector, rows, k
+        )
+        return self._text_results(top_indices, scores)
+    
+    def warm_up(self):
+        """Pay the JIT cost for the text kernel before serving requests"""
+        recommender_kernels.warm_up(self.tfidf_matrix)
+    
+    def _vectorize(self, texts):
+        """IDF-weighted hashed term counts (not yet normalized)"""
+        return HASHER.transform(texts).multiply(self.idf).tocsr()
+    
+    def _query_vectors(self, queries):
+        """Dense unit-length query vectors, shape (queries, features)"""
+        query_vectors = self._vectorize(queries).toarray()
+        query_vectors /= (np.linalg.norm(query_vectors, axis=1, keepdims=True) + 1e-12)
+        return query_vectors
+    
+    def _text_similarities(self, query_vectors):
+        """Cosine similarity of each query vector against every phone, shape (queries, phones)"""
+        # No-Numba fallback: float16 dense scoring via SimSIMD or NumPy
+        query_vectors = query_vectors.astype(np.float16)
         
-        # Return results
+        # Calculate similarity (rows are pre-normalized, so cosine == dot product)
+        if simsimd is not None:
+            return np.asarray(simsimd.cdist(query_vectors, self.tfidf_dense, metric='dot'))
+        # float16 storage, float32 accumulation
+        return np.einsum('bj,ij->bi', query_vectors, self.tfidf_dense, dtype=np.float32)
+    
+    def _top_text_results(self, similarities, top_k, rows=None):
+        """Build the top K results from one row of similarities (aligned with rows if given)"""
+        # Get top K indices (partial selection, then sort only the K winners)
+        k = min(top_k, similarities.size)
+        if k <= 0:
+            return []
+        # Ties go to the earlier phone, as in the compiled kernel
+        kth_score = -np.partition(-similarities, k - 1)[k - 1]
+        top_indices = np.flatnonzero(similarities >= kth_score)
+        top_indices = top_indices[np.argsort(-similarities[top_indices], kind='stable')[:k]]
+        scores = similarities[top_indices]
+        if rows is not None:
+            top_indices = rows[top_indices]
+        return self._text_results(top_indices, scores)
+    
+    def _text_results(self, top_indices, scores, require_match=True):
+        """Result dicts for the ranked phones"""
+        cols = self.result_columns
         results = []
-        for idx in top_indices:
-            if similarities[idx] > 0:  # Only include if similarity > 0
+        for idx, score in zip(top_indices, scores):
+            if score > 0 or not require_match:  # Only include if similarity > 0
                 results.append({
-                    'model': self.df.loc[idx, 'model'],
-                    'brand': self.df.loc[idx, 'brand'],
-                    'price': int(self.df.loc[idx, 'price']),
-                    'rating': float(self.df.loc[idx, 'rating']),
-                    'processor': self.df.loc[idx, 'processor'],
-                    'best_for': self.df.loc[idx, 'best_for'],
-                    'similarity_score': float(similarities[idx])
+                    'model': cols['model'][idx],
+                    'brand': cols['brand'][idx],
+                    'price': cols['price'][idx],
+                    'rating': cols['rating'][idx],
+                    'processor': cols['processor'][idx],
+                    'best_for': cols['best_for'][idx],
+                    'similarity_score': score
                 })
         
         return results
     
+    def use_case_mask(self, use_case):
+        """Boolean mask of phones whose best_for mentions use_case"""
+        use_case = use_case.lower().strip()
+        rows = self.use_case_index.get(use_case)
+        if rows is not None:
+            mask = np.zeros(len(self.best_for_lower), dtype=bool)
+            mask[rows] = True
+            return mask
+        # Not an exact tag, fall back to substring match
+        return np.char.find(self.best_for_lower, use_case) >= 0
+    
+    def _top_rated(self, candidates, top_k):
+        """Top K candidate rows by rating, ties broken by catalog order"""
+        k = min(top_k, candidates.size)
+        if k <= 0:
+            return candidates[:0]
+        ratings = self.rating_np[candidates]
+        top = np.argpartition(-ratings, k - 1)[:k]
+        top = top[np.lexsort((candidates[top], -ratings[top]))]
+        return candidates[top]
+    
     def recommend_by_specs(self, budget=None, use_case=None, top_k=5):
         """Recommend phones by budget and use case"""
-        results_df = self.df.copy()
+        mask = np.ones(len(self.df), dtype=bool)
         
         # Filter by budget
         if budget:
-            results_df = results_df[results_df['price'] <= budget]
+            mask &= self.price_np <= budget
         
         # Filter by use case
         if use_case and use_case.lower() != 'overall':
-            results_df = results_df[results_df['best_for'].str.lower().str.contains(use_case, na=False)]
-        
-        if len(results_df) == 0:
-            return []
+            mask &= self.use_case_mask(use_case)
         
-        # Sort by rating
-        results_df = results_df.sort_values('rating', ascending=False).head(top_k)
+        top_indices = self._top_rated(np.flatnonzero(mask), top_k)
         
+        cols = self.result_columns
         results = []
-        for _, row in results_df.iterrows():
+        for idx in top_indices:
             results.append({
-                'model': row['model'],
-                'brand': row['brand'],
-                'price': int(row['price']),
-                'rating': float(row['rating']),
-                'processor': row['processor'],
-                'best_for': row['best_for'],
-                'reason': row['reason']
+                'model': cols['model'][idx],
+                'brand': cols['brand'][idx],
+                'price': cols['price'][idx],
+                'rating': cols['rating'][idx],
+                'processor': cols['processor'][idx],
+                'best_for': cols['best_for'][idx],
+                'reason': cols['reason'][idx]
             })
         
         return results
@@ -126,13 +397,48 @@ class PhoneRecommender:
         """Save trained model"""
         if model_path is None:
             model_path = MODELS_DIR / "phone_recommender.pkl"
+        model_path = Path(model_path)
+        arrays_dir = _arrays_dir(model_path)
+        arrays_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Numeric state as raw .npy files. Each file is renamed into place, so
+        # readers (and existing mmaps) never see a partially written array
+        arrays = {attr: getattr(self, attr) for attr in ARRAY_ATTRS}
+        for part in CSR_PARTS:
+            arrays[f"tfidf_{part}"] = getattr(self.tfidf_matrix, part)
+        arrays["tfidf_shape"] = np.array(self.tfidf_matrix.shape)
+        for name, array in arrays.items():
+            _write_atomically(arrays_dir / f"{name}.npy", lambda f, array=array: np.save(f, array))
         
-        joblib.dump(self, model_path)
+        # Pickle only what is left (DataFrame, use case index)
+        state = self.__dict__.copy()
+        for attr in ARRAY_ATTRS + ['tfidf_matrix', 'query_batcher', 'result_columns']:
+            state[attr] = None
+        # Written last, so a complete pickle means the arrays are in place too
+        _write_atomically(model_path, lambda f: joblib.dump(state, f))
         print(f"✅ Model saved to {model_path}")
     
     def load_model(self, model_path):
         """Load trained model"""
-        return joblib.load(model_path)
+        _cached_text.cache_clear()
+        arrays_dir = _arrays_dir(model_path)
+        
+        recommender = PhoneRecommender()
+        recommender.__dict__.update(joblib.load(model_path))
+        
+        # mmap so forked workers share pages through the OS page cache
+        for attr in ARRAY_ATTRS:
+            setattr(recommender, attr, np.load(arrays_dir / f"{attr}.npy", mmap_mode='r'))
+        data, indices, indptr = (
+            np.load(arrays_dir / f"tfidf_{part}.npy", mmap_mode='r') for part in CSR_PARTS
+        )
+        shape = tuple(np.load(arrays_dir / "tfidf_shape.npy"))
+        recommender.tfidf_matrix = sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+        
+        # Views of the unpickled DataFrame rather than a second pickled copy
+        recommender.build_result_columns()
+        
+        return recommender
 
 def train_model():
     """Train the recommendation model"""
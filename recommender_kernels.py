@@ -0,0 +1,76 @@
+"""
+Compiled Kernels for the Recommendation Engine
+Numba top-K cosine over the CSR TF-IDF matrix
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange, get_num_threads
+except ImportError:  # optional JIT; recommender falls back to NumPy scoring
+    njit = None
+
+# Below any cosine of unit vectors; avoids inf, which fastmath assumes never occurs
+EMPTY_SCORE = -2.0
+
+def _topk_cosine(mat_data, mat_indices, mat_indptr, q_dense, rows, k, n_threads):
+    """Top K (indices, scores) of the given CSR rows dotted with a dense unit query, best first"""
+    n_rows = rows.size
+    n_chunks = min(n_threads, max(n_rows, 1))
+    chunk_size = (n_rows + n_chunks - 1) // n_chunks
+
+    # Each chunk keeps its own sorted top K, merged after the parallel loop
+    chunk_idx = np.full((n_chunks, k), -1, dtype=np.int64)
+    chunk_scores = np.full((n_chunks, k), EMPTY_SCORE)
+    for c in prange(n_chunks):
+        for r in range(c * chunk_size, min((c + 1) * chunk_size, n_rows)):
+            row = rows[r]
+            score = 0.0
+            for j in range(mat_indptr[row], mat_indptr[row + 1]):
+                score += mat_data[j] * q_dense[mat_indices[j]]
+            if score > chunk_scores[c, k - 1]:
+                pos = k - 1
+                while pos > 0 and score > chunk_scores[c, pos - 1]:
+                    chunk_scores[c, pos] = chunk_scores[c, pos - 1]
+                    chunk_idx[c, pos] = chunk_idx[c, pos - 1]
+                    pos -= 1
+                chunk_scores[c, pos] = score
+                chunk_idx[c, pos] = row
+
+    top_idx = np.full(k, -1, dtype=np.int64)
+    top_scores = np.full(k, EMPTY_SCORE)
+    for c in range(n_chunks):
+        for i in range(k):
+            if chunk_idx[c, i] < 0:
+                break
+            score = chunk_scores[c, i]
+            if score > top_scores[k - 1]:
+                pos = k - 1
+                while pos > 0 and score > top_scores[pos - 1]:
+                    top_scores[pos] = top_scores[pos - 1]
+                    top_idx[pos] = top_idx[pos - 1]
+                    pos -= 1
+                top_scores[pos] = score
+                top_idx[pos] = chunk_idx[c, i]
+
+    found = 0
+    while found < k and top_idx[found] >= 0:
+        found += 1
+    return top_idx[:found], top_scores[:found]
+
+if njit is not None:
+    _topk_cosine_jit = njit(cache=True, fastmath=True, parallel=True)(_topk_cosine)
+
+    def topk_cosine(mat_data, mat_indices, mat_indptr, q_dense, rows, k):
+        """Compiled top K cosine, one chunk of rows per Numba thread"""
+        return _topk_cosine_jit(mat_data, mat_indices, mat_indptr, q_dense, rows, k, get_num_threads())
+else:
+    topk_cosine = None
+
+def warm_up(tfidf_matrix):
+    """Compile the kernel for this matrix's array types ahead of the first request"""
+    if topk_cosine is None:
+        return
+    query = np.zeros(tfidf_matrix.shape[1])
+    rows = np.arange(tfidf_matrix.shape[0])
+    topk_cosine(tfidf_matrix.data, tfidf_matrix.indices, tfidf_matrix.indptr, query, rows, 1)
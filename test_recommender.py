@@ -0,0 +1,99 @@
+"""
+Tests for the Phone Recommendation Engine
+Run with: python -m pytest
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import recommender_kernels
+from recommender import PhoneRecommender, DATA_DIR, parse_budget, pyarrow
+
+QUERIES = [
+    "gaming", "camera flagship", "snapdragon", "best camera phone", "battery value",
+    "ai", "compact performance", "samsung", "selfie portrait", "clean android",
+]
+
+@pytest.fixture(scope="module")
+def recommender():
+    model = PhoneRecommender()
+    model.load_data(DATA_DIR / "phones_data.csv")
+    model.prepare_features()
+    return model
+
+def _ranked(similarities, top_k):
+    """Indices of the top K matching phones, best first (stable on ties)"""
+    order = np.argsort(-similarities, kind="stable")[:top_k]
+    return [int(idx) for idx in order if similarities[idx] > 0]
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_float16_top_k_matches_sparse(recommender, query):
+    query_vectors = recommender._query_vectors([query])
+    exact = (recommender.tfidf_matrix @ query_vectors[0]).ravel()
+    quantized = recommender._text_similarities(query_vectors)[0]
+
+    assert recommender.tfidf_dense.dtype == np.float16
+    assert _ranked(quantized, 5) == _ranked(exact, 5)
+    np.testing.assert_allclose(quantized, exact, atol=1e-3)
+
+@pytest.mark.skipif(recommender_kernels.topk_cosine is None, reason="Numba not installed")
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("budget", [None, 30000])
+def test_compiled_top_k_matches_numpy(recommender, query, budget):
+    query_vector = recommender._query_vectors([query])[0]
+    rows = recommender._budget_rows(budget)
+    exact = (recommender.tfidf_matrix @ query_vector).ravel()
+    if rows is not None:
+        exact = exact[rows]
+    compiled = recommender._top_text_results_compiled(query_vector, 5, rows)
+    reference = recommender._top_text_results(exact, 5, rows)
+    assert [phone["model"] for phone in compiled] == [phone["model"] for phone in reference]
+
+@pytest.mark.parametrize("query, expected", [
+    ("gaming under 20,000", ("gaming", 20000)),
+    ("phone under 1,20,000", ("phone", 120000)),
+    ("camera under 1.5k", ("camera", 1500)),
+    ("below 1.5 lakh", ("", 150000)),
+    ("under 20k", ("", 20000)),
+    ("<= 15000", ("", 15000)),
+    ("gaming 20k", ("gaming", 20000)),
+    ("1.5k", ("1.5k", None)),
+    ("4k video", ("4k video", None)),
+    ("camera 4k", ("camera 4k", None)),
+    ("under 20,00", ("under 20,00", None)),
+    ("snapdragon 8 gen 4", ("snapdragon 8 gen 4", None)),
+])
+def test_parse_budget(query, expected):
+    assert parse_budget(query) == expected
+
+def test_comma_grouped_budget_filters_text_results(recommender):
+    results = recommender.recommend_by_text("gaming under 30,000")
+    assert [phone["model"] for phone in results] == ["Realme Narzo 70 Pro 5G", "Poco X6 Pro"]
+
+def _default_mode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def test_saved_model_files_use_default_mode(recommender, tmp_path):
+    model_path = tmp_path / "model.pkl"
+    recommender.save_model(model_path)
+    saved = [model_path, *(tmp_path / "model_arrays").iterdir()]
+    assert {path.stat().st_mode & 0o777 for path in saved} == {_default_mode()}
+
+@pytest.mark.skipif(pyarrow is None, reason="Parquet snapshot needs pyarrow")
+def test_parquet_snapshot_uses_default_mode(tmp_path):
+    csv_path = tmp_path / "phones_data.csv"
+    csv_path.write_bytes((DATA_DIR / "phones_data.csv").read_bytes())
+    PhoneRecommender().load_data(csv_path)
+    assert csv_path.with_suffix(".parquet").stat().st_mode & 0o777 == _default_mode()
+
+def test_batch_matches_single_queries(recommender):
+    queries = QUERIES + ["gaming under 30,000", "phone under 15000"]
+    top_ks = [5] * len(queries)
+    batched = recommender.recommend_by_text_batch(queries, top_ks)
+    singles = [recommender.recommend_by_text_batch([q], [k])[0] for q, k in zip(queries, top_ks)]
+    strip = lambda results: [(phone["model"], round(float(phone["similarity_score"]), 6)) for phone in results]
+    assert [strip(r) for r in batched] == [strip(r) for r in singles]